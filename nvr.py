@@ -1,66 +1,641 @@
 import cv2
+import numpy as np
 import datetime
 import os
+import sys
+import re
+import platform
 import time
 import shutil
+import subprocess
+import queue
+import multiprocessing
+import ctypes
 import tkinter as tk
 from tkinter import simpledialog, messagebox
-from threading import Thread, Event
+from threading import Thread, Event, Condition
+from concurrent.futures import ThreadPoolExecutor
 import urllib.parse
 import logging
+from logging.handlers import QueueHandler, QueueListener
 import json
+import hashlib
+import gc
 
-# Setup logging
-logging.basicConfig(
-    filename='nvr_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+# Setup logging: file log hanya ditulis oleh QueueListener di proses utama,
+# thread dan proses perekam cukup memasukkan record ke antrean
 logger = logging.getLogger(__name__)
 
+# Formatter tidak memakai info thread/proses; jangan kumpulkan di setiap record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+def setup_logging(log_queue):
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.INFO)
+    root_logger.addHandler(QueueHandler(log_queue))
+
+def start_log_listener():
+    log_queue = multiprocessing.Queue()
+    file_handler = logging.FileHandler('nvr_log.txt')
+    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    setup_logging(log_queue)
+    return log_queue, listener
+
+# Encoder hardware ffmpeg, urut sesuai prioritas; libx264 sebagai fallback CPU
+HW_ENCODERS = [
+    ('h264_nvenc', ['-preset', 'p4']),
+    ('h264_qsv', ['-preset', 'faster']),
+    ('hevc_vaapi', []),
+]
+SW_ENCODER = ('libx264', ['-preset', 'veryfast'])
+
+# Encoder V4L2 M2M (Raspberry Pi dan SBC ARM lain), hanya dicoba di mesin ARM
+V4L2M2M_ENCODER = ('h264_v4l2m2m', [])
+ARM_MACHINES = ('aarch64', 'arm64', 'armv7l')
+
+# False: stream RTSP langsung di-copy ke MP4 oleh ffmpeg tanpa decode.
+# True: frame di-decode lalu di-encode ulang, untuk kamera yang stream-nya
+# tidak bisa disimpan langsung ke MP4 (mis. MJPEG).
+TRANSCODE = False
+
+# FPS maksimum rekaman mode transcode. Jika kamera lebih cepat, kelebihan frame
+# hanya di-grab tanpa decode maupun encode. 0 = ikuti fps kamera
+TRANSCODE_FPS = 15
+
+# Ukuran frame preview (lebar, tinggi); satu buffer ini juga bisa dipakai
+# untuk analitik lain yang cukup dengan frame kecil
+PREVIEW_SIZE = (680, 460)
+PREVIEW_SHAPE = (PREVIEW_SIZE[1], PREVIEW_SIZE[0], 3)
+
+# Format nama file rekaman (strftime)
+VIDEO_FILENAME = 'video_%H-%M-%S.mp4'
+
+# Interval pembersihan rekaman lama (detik)
+CLEANUP_INTERVAL = 3600
+
+# Jeda antar percobaan menyambung ulang stream RTSP (detik)
+RECONNECT_DELAY = 5
+
+# Opsi FFMPEG untuk capture OpenCV. Di-set sekali saat import, sebelum stream
+# apa pun dibuka, karena mengubah os.environ dari banyak thread tidak aman.
+# setdefault agar nilai dari environment pengguna tetap dipakai.
+os.environ.setdefault(
+    'OPENCV_FFMPEG_CAPTURE_OPTIONS',
+    'rtsp_transport;tcp|buffer_size;102400|max_delay;500000|'
+    'fflags;nobuffer|flags;low_delay'
+)
+
+# Timeout buka/baca stream (ms) agar kamera mati cepat masuk loop reconnect.
+# Lewat parameter open() OpenCV, bukan opsi `stimeout` yang dihapus di FFmpeg 5
+STREAM_TIMEOUT_MS = 5000
+STREAM_TIMEOUT_PARAMS = [cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, STREAM_TIMEOUT_MS,
+                         cv2.CAP_PROP_READ_TIMEOUT_MSEC, STREAM_TIMEOUT_MS]
+
+# Pipeline GStreamer dengan appsink yang hanya menyimpan frame terbaru
+GSTREAMER_AVAILABLE = re.search(r'GStreamer:\s*YES', cv2.getBuildInformation()) is not None
+GSTREAMER_PIPELINE = (
+    'rtspsrc location={url} latency=100 protocols=tcp ! rtph264depay ! avdec_h264 ! '
+    'videoconvert ! video/x-raw,format=BGR ! appsink max-buffers=1 drop=true sync=false'
+)
+
+# Ukuran buffer pipe stdin ke ffmpeg
+PIPE_BUFFER_SIZE = 1 << 20
+
+# Panjang antrean frame ke thread penulis; cukup untuk menumpuk decode dan
+# encode tanpa menahan banyak frame mentah di RAM
+WRITE_QUEUE_SIZE = 4
+
+# Format alamat IPv4 (batas tiap oktet <= 255 dicek terpisah di is_valid_host)
+# dan hostname, mis. kamera DDNS. Hanya digit ASCII: \d juga cocok dengan
+# digit Unicode yang diterima int()
+_IP_RE = re.compile(r'^(?:[0-9]{1,3}\.){3}[0-9]{1,3}$')
+_HOSTNAME_RE = re.compile(r'^(?!-)[A-Za-z0-9-]{1,63}(?<!-)(?:\.(?!-)[A-Za-z0-9-]{1,63}(?<!-))*$')
+
+# Hasil probe encoder, di-cache agar hanya dijalankan sekali
+_video_encoder = None
+
+# Nama opsi timeout socket RTSP ffmpeg (-stimeout sebelum FFmpeg 5, -timeout
+# sesudahnya), di-cache seperti _video_encoder
+_rtsp_timeout_option = None
+
+# Core untuk thread capture dan penulis proses perekam ini, dan semua core
+# yang boleh dipakai proses (None jika affinity tidak didukung)
+_recorder_cpu = None
+_allowed_cpus = None
+
+# Digest isi nvr_config.json terakhir (dibaca atau ditulis), untuk melewati
+# penyimpanan yang tidak berubah
+_last_saved_hash = None
+
+# Antrean penyimpanan config, dikerjakan oleh satu thread settings_writer
+_save_queue = queue.Queue()
+SAVE_RETRIES = 3
+
+# Thread pemeliharaan (hapus rekaman lama) diberi prioritas rendah agar
+# scheduler OS selalu mendahulukan proses perekam
+def lower_thread_priority():
+    try:
+        if os.name == 'nt':
+            THREAD_PRIORITY_BELOW_NORMAL = -1
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_BELOW_NORMAL)
+        elif sys.platform.startswith('linux'):
+            # Hanya di Linux nilai nice berlaku per thread; di macOS/BSD ini
+            # me-renice seluruh proses GUI, dan proses perekam mewarisinya
+            os.setpriority(os.PRIO_PROCESS, 0, 10)
+    except Exception as e:
+        logger.error("Error lowering thread priority: %s", e)
+
+def choose_recorder_cpu(index):
+    # Kamera dibagi round-robin ke core yang boleh dipakai. Hanya ada di Linux
+    global _recorder_cpu, _allowed_cpus
+    if not hasattr(os, 'sched_setaffinity'):
+        return
+    _allowed_cpus = os.sched_getaffinity(0)
+    cpus = sorted(_allowed_cpus)
+    _recorder_cpu = cpus[index % len(cpus)]
+
+def pin_current_thread():
+    # Thread capture dan penulis satu kamera di satu core agar buffer frame
+    # tetap di cache core itu. Di Linux affinity pid 0 hanya berlaku untuk
+    # thread pemanggil, jadi thread lain (termasuk decoder FFmpeg) tidak ikut
+    if _recorder_cpu is None:
+        return
+    try:
+        os.sched_setaffinity(0, {_recorder_cpu})
+    except OSError as e:
+        logger.error("Error setting CPU affinity: %s", e)
+
 # Fungsi-fungsi untuk manajemen file dan direktori
-def create_directory_for_today():
+def camera_folder_name(ip):
+    # IP dari config lama belum tervalidasi; buang karakter yang tidak aman untuk path.
+    # Nama yang hanya titik ('.', '..') akan keluar dari folder harian
+    name = re.sub(r'[^0-9A-Za-z.-]', '_', ip)
+    if not name.strip('.'):
+        name = name.replace('.', '_') or '_'
+    return name
+
+def create_directory_for_today(camera_folder):
+    # Satu subfolder per kamera di dalam folder harian, agar nama file berbasis
+    # jam dari beberapa kamera tidak saling menimpa
     today = datetime.datetime.now().strftime("%Y-%m-%d")
-    directory = f"storage/{today}"
+    directory = f"storage/{today}/{camera_folder}"
     if not os.path.exists(directory):
         os.makedirs(directory)
     return directory
 
-def get_video_filename(directory):
-    current_time = datetime.datetime.now().strftime("%H-%M-%S")
-    return os.path.join(directory, f"video_{current_time}.mp4")
+def delete_folder(folder_path):
+    shutil.rmtree(folder_path)
+    logger.info("Deleted old folder: %s", folder_path)
+
+def folder_age_timestamp(entry):
+    # Folder harian bernama YYYY-MM-DD dan terakhir ditulis di akhir hari itu,
+    # jadi umurnya cukup dibaca dari nama tanpa stat(); folder lain pakai mtime
+    try:
+        day = datetime.datetime.strptime(entry.name, "%Y-%m-%d")
+        return day.timestamp() + 86400
+    except ValueError:
+        return entry.stat().st_mtime
 
 def clean_old_videos(storage_path, days_to_keep):
     try:
         now = time.time()
         cutoff = now - (days_to_keep * 86400)
-        for folder in os.listdir(storage_path):
-            folder_path = os.path.join(storage_path, folder)
-            if os.path.isdir(folder_path) and os.path.getmtime(folder_path) < cutoff:
-                shutil.rmtree(folder_path)
-                logger.info(f"Deleted old folder: {folder_path}")
+        with os.scandir(storage_path) as entries:
+            old_folders = [entry.path for entry in entries
+                           if entry.is_dir(follow_symlinks=False)
+                           and folder_age_timestamp(entry) < cutoff]
+
+        # Hapus beberapa folder sekaligus agar unlink yang menunggu disk saling tumpang tindih
+        with ThreadPoolExecutor(max_workers=4, initializer=lower_thread_priority) as executor:
+            list(executor.map(delete_folder, old_folders))
     except Exception as e:
-        logger.error(f"Error cleaning old videos: {str(e)}")
+        logger.error("Error cleaning old videos: %s", e)
+
+def cleanup_loop(shutdown_event, settings):
+    # Berjalan di thread sendiri agar rmtree tidak menghambat pembacaan frame
+    lower_thread_priority()
+    while not shutdown_event.wait(CLEANUP_INTERVAL):
+        clean_old_videos('storage/', settings.get('days_to_keep', 7))
+
+# Fungsi untuk membuka stream RTSP
+def open_stream(cap, rtsp_url):
+    # Selalu memakai objek VideoCapture yang sama; membuat objek baru pada
+    # setiap reconnect membocorkan memori di beberapa build OpenCV
+    cap.release()
+
+    # Thread decoder dibuat saat stream dibuka dan mewarisi affinity thread
+    # pemanggil; buka dengan semua core agar decode multithread tidak terkunci
+    # di core thread capture yang sedang reconnect
+    pinned = None
+    if _allowed_cpus is not None:
+        pinned = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, _allowed_cpus)
+    try:
+        if GSTREAMER_AVAILABLE:
+            if cap.open(GSTREAMER_PIPELINE.format(url=rtsp_url), cv2.CAP_GSTREAMER):
+                return True
+            logger.error("Pipeline GStreamer gagal dibuka, menggunakan FFMPEG")
+
+        if not cap.open(rtsp_url, cv2.CAP_FFMPEG, STREAM_TIMEOUT_PARAMS):
+            return False
+
+        # Simpan hanya frame terbaru agar preview tidak tertinggal
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return True
+    finally:
+        if pinned is not None:
+            os.sched_setaffinity(0, pinned)
+
+# Slot frame terbaru antara thread capture (producer) dan thread rekam (consumer)
+class LatestFrame:
+    def __init__(self, pool_size=WRITE_QUEUE_SIZE + 2):
+        # Pool buffer frame untuk consumer: cukup untuk antrean penulis, frame
+        # yang sedang ditulis, dan frame yang sedang dipegang loop rekam
+        self._pool_size = pool_size
+        self._free = queue.SimpleQueue()
+        self._buf = None
+        self._seq = 0
+        self._read_seq = 0
+        self._dropped = 0
+        self.closed = False
+        self._cond = Condition()
+
+    def put(self, frame):
+        with self._cond:
+            if self._buf is None or self._buf.shape != frame.shape:
+                self._buf = np.empty_like(frame)
+                # Ukuran frame baru: pool lama dibuang, buffer-nya yang masih
+                # beredar ditolak oleh release()
+                self._free = queue.SimpleQueue()
+                for _ in range(self._pool_size):
+                    self._free.put(np.empty_like(frame))
+            np.copyto(self._buf, frame)
+            # Frame sebelumnya belum diambil consumer: ditimpa, dihitung drop
+            if self._read_seq != self._seq:
+                self._dropped += 1
+            self._seq += 1
+            self._cond.notify_all()
+
+    def get(self, last_seq, timeout=1.0):
+        # Tunggu frame yang lebih baru dari last_seq lalu salin ke buffer dari
+        # pool; pemanggil mengembalikannya lewat release() setelah selesai
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq != last_seq or self.closed, timeout)
+            if self._seq == last_seq:
+                return last_seq, None
+            try:
+                out = self._free.get_nowait()
+            except queue.Empty:
+                # Semua buffer pool masih dipegang penulis
+                out = np.empty_like(self._buf)
+            np.copyto(out, self._buf)
+            self._read_seq = self._seq
+            return self._seq, out
+
+    def release(self, frame):
+        with self._cond:
+            if frame.shape == self._buf.shape and self._free.qsize() < self._pool_size:
+                self._free.put(frame)
+
+    def take_dropped(self):
+        with self._cond:
+            dropped, self._dropped = self._dropped, 0
+            return dropped
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+# Slot preview di shared memory: ditulis proses perekam, dibaca thread GUI
+class SharedPreview:
+    def __init__(self, shape=PREVIEW_SHAPE):
+        self.shape = shape
+        self._data = multiprocessing.Array('B', int(np.prod(shape)))
+        self._seq = multiprocessing.Value('Q', 0, lock=False)
+
+    def _view(self):
+        return np.frombuffer(self._data.get_obj(), dtype=np.uint8).reshape(self.shape)
+
+    def put(self, frame):
+        with self._data.get_lock():
+            np.copyto(self._view(), frame)
+            self._seq.value += 1
+
+    def get(self, last_seq, out=None):
+        # Tidak menunggu; GUI mem-polling lewat root.after
+        with self._data.get_lock():
+            if self._seq.value == last_seq:
+                return last_seq, None
+            if out is None:
+                out = np.empty(self.shape, dtype=np.uint8)
+            np.copyto(out, self._view())
+            return self._seq.value, out
+
+def iter_frames(cap, rtsp_url, stop_event, retrieve_every_n=None, preview_event=None):
+    # Menghasilkan None pada putaran tanpa frame baru agar pemanggil tetap bisa
+    # memeriksa hal lain. Jika preview_event diberikan (mode passthrough), rekaman
+    # tidak butuh frame sama sekali: stream hanya dibuka selama preview aktif.
+    # retrieve_every_n None: decode ~2 FPS sesuai fps stream yang sedang terbuka
+    frame_idx = 0
+    frame = None
+    every_n = retrieve_every_n or 1
+    while not stop_event.is_set():
+        if preview_event is not None and not preview_event.is_set():
+            cap.release()
+            preview_event.wait(1)
+            yield None
+            continue
+
+        if not cap.isOpened():
+            if not open_stream(cap, rtsp_url):
+                stop_event.wait(RECONNECT_DELAY)
+            elif retrieve_every_n is None:
+                every_n = max(1, int(cap.get(cv2.CAP_PROP_FPS) or 25) // 2)
+            yield None
+            continue
+
+        if not cap.grab():
+            logger.error("Stream RTSP terputus, mencoba menyambung ulang")
+            cap.release()
+            continue
+
+        frame_idx += 1
+        if (frame_idx - 1) % every_n:
+            yield None
+            continue
+
+        # Decode ke buffer yang sama setiap kali; pemanggil harus menyalin
+        # atau memakainya sebelum frame berikutnya
+        ret, frame = cap.retrieve(frame)
+        if not ret:
+            logger.error("Gagal men-decode frame, mencoba menyambung ulang")
+            cap.release()
+            continue
+        yield frame
+
+def capture_frames(cap, rtsp_url, slot, stop_event, retrieve_every_n=1):
+    pin_current_thread()
+    try:
+        for frame in iter_frames(cap, rtsp_url, stop_event, retrieve_every_n):
+            if frame is not None:
+                slot.put(frame)
+    finally:
+        slot.close()
+
+def close_on_stop(stop_event, slot):
+    # Bangunkan loop perekam yang sedang menunggu frame begitu perekaman
+    # dihentikan, tanpa menunggu timeout get()
+    stop_event.wait()
+    slot.close()
+
+# Fungsi-fungsi untuk encoding video via ffmpeg
+def query_ffmpeg(*args):
+    result = subprocess.run(['ffmpeg', '-hide_banner', *args],
+                            capture_output=True, text=True, timeout=10)
+    return result.stdout.split()
+
+def rtsp_timeout_option():
+    # Di FFmpeg < 5 `-timeout` untuk RTSP berarti menunggu koneksi masuk (mode
+    # listen), jadi nama opsinya harus dipilih sesuai versi
+    global _rtsp_timeout_option
+    if _rtsp_timeout_option is None:
+        try:
+            options = query_ffmpeg('-h', 'demuxer=rtsp')
+        except Exception as e:
+            logger.error("Error probing ffmpeg rtsp options: %s", e)
+            options = []
+        _rtsp_timeout_option = '-stimeout' if '-stimeout' in options else '-timeout'
+    return _rtsp_timeout_option
+
+def hwaccel_args(encoder):
+    # VAAPI butuh device dan frame yang sudah di-upload ke memori GPU;
+    # return (opsi sebelum input, opsi filter)
+    if encoder.endswith('_vaapi'):
+        return ['-vaapi_device', '/dev/dri/renderD128'], ['-vf', 'format=nv12,hwupload']
+    return [], []
+
+def encoder_works(encoder, options):
+    # Build ffmpeg distro/statik meng-compile nvenc, qsv, dll. walaupun
+    # hardware-nya tidak ada; satu-satunya cara pasti adalah mencoba encode
+    device_args, filter_args = hwaccel_args(encoder)
+    cmd = (['ffmpeg', '-hide_banner', '-loglevel', 'error'] + device_args +
+           ['-f', 'lavfi', '-i', 'color=s=256x256', '-frames:v', '1'] + filter_args +
+           ['-c:v', encoder] + options + ['-f', 'null', '-'])
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=15).returncode == 0
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+
+def detect_video_encoder():
+    global _video_encoder
+    if _video_encoder is not None:
+        return _video_encoder
+
+    candidates = list(HW_ENCODERS)
+    if platform.machine().lower() in ARM_MACHINES:
+        candidates.append(V4L2M2M_ENCODER)
+
+    _video_encoder = SW_ENCODER
+    try:
+        # Lewati encoder yang tidak di-compile tanpa menjalankan trial encode
+        encoders = query_ffmpeg('-encoders')
+        for encoder, options in candidates:
+            if encoder in encoders and encoder_works(encoder, options):
+                _video_encoder = (encoder, options)
+                break
+    except Exception as e:
+        logger.error("Error probing ffmpeg encoders: %s", e)
+
+    logger.info("Using video encoder: %s", _video_encoder[0])
+    return _video_encoder
+
+def open_video_writer(video_file, frame_width, frame_height, fps):
+    encoder, options = detect_video_encoder()
+    device_args, filter_args = hwaccel_args(encoder)
+
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error'] + device_args
+    cmd += ['-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{frame_width}x{frame_height}', '-r', str(fps), '-i', '-']
+    cmd += filter_args
+    cmd += ['-c:v', encoder] + options + ['-b:v', '4M', video_file]
+
+    # stdin berupa io.BufferedWriter; buffer 1 MB menggabungkan frame kecil
+    # menjadi write() yang lebih besar
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, bufsize=PIPE_BUFFER_SIZE)
+
+def close_video_writer(proc):
+    try:
+        proc.stdin.flush()
+        proc.stdin.close()
+    except OSError:
+        # ffmpeg sudah mati (BrokenPipeError); sudah dicatat oleh write_frames,
+        # split ini cukup diakhiri
+        pass
+    finally:
+        proc.wait()
+
+def fall_back_to_software_encoder():
+    # Encoder hardware yang lolos trial bisa tetap gagal (mis. sesi NVENC habis);
+    # split berikutnya memakai libx264. Return False jika sudah libx264
+    global _video_encoder
+    if _video_encoder is None or _video_encoder == SW_ENCODER:
+        return False
+    logger.error("Encoder %s gagal, beralih ke %s", _video_encoder[0], SW_ENCODER[0])
+    _video_encoder = SW_ENCODER
+    return True
+
+def write_frames(proc, frame_q, release):
+    # Thread penulis: satu-satunya pemilik pipe ffmpeg selama satu split.
+    # Setelah ditulis, buffer frame dikembalikan ke pool lewat release
+    pin_current_thread()
+    while True:
+        frame = frame_q.get()
+        if frame is None:
+            break
+        try:
+            # Buffer pool LatestFrame dibuat dengan np.empty_like sehingga selalu
+            # C-contiguous, jadi langsung ditulis tanpa salinan tobytes()
+            proc.stdin.write(frame.data.cast('B'))
+        except OSError as e:
+            logger.error("Error writing frame: %s", e)
+            break
+        finally:
+            release(frame)
+
+def enqueue_frame(frame_q, frame, timeout, release):
+    # Tunggu penulis selama `timeout` (backpressure); jika selama itu tidak ada
+    # frame yang ditulis, buang frame paling lama agar rekaman tetap sesuai
+    # waktu nyata. Return True jika ada frame yang dibuang.
+    try:
+        frame_q.put(frame, timeout=timeout)
+        return False
+    except queue.Full:
+        try:
+            release(frame_q.get_nowait())
+        except queue.Empty:
+            pass
+        frame_q.put_nowait(frame)
+        return True
+
+def stop_frame_writer(frame_q, writer, release):
+    while writer.is_alive():
+        try:
+            frame_q.put(None, timeout=1)
+            break
+        except queue.Full:
+            pass
+    writer.join()
+    # Penulis yang berhenti karena error meninggalkan frame di antrean
+    while True:
+        try:
+            frame = frame_q.get_nowait()
+        except queue.Empty:
+            break
+        if frame is not None:
+            release(frame)
+
+def open_passthrough_writer(rtsp_url, filename_template, split_duration, record_duration):
+    # Segment muxer ffmpeg yang memecah file tiap split_duration. Batas split
+    # diselaraskan ke jam dinding (kelipatan split_duration sejak tengah malam),
+    # jadi semua kamera berganti file pada detik yang sama dan tidak bergeser
+    # walaupun proses ffmpeg dimulai ulang.
+    # Tanpa timeout socket, kamera yang hilang dari jaringan tanpa menutup koneksi
+    # TCP membuat ffmpeg menunggu selamanya (-t tidak pernah tercapai); dengan
+    # timeout ffmpeg keluar dengan error dan loop perekam memulainya lagi
+    cmd = ['ffmpeg', '-y', '-loglevel', 'error', '-rtsp_transport', 'tcp',
+           rtsp_timeout_option(), str(STREAM_TIMEOUT_MS * 1000),
+           '-i', rtsp_url, '-an', '-c:v', 'copy', '-t', str(record_duration),
+           '-f', 'segment', '-segment_time', str(split_duration), '-segment_atclocktime', '1',
+           '-reset_timestamps', '1', '-strftime', '1',
+           filename_template]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+def close_passthrough_writer(proc):
+    if proc.poll() is not None:
+        return
+    try:
+        # 'q' membuat ffmpeg berhenti dan menutup file MP4 dengan benar
+        proc.communicate(b'q', timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.terminate()
+        proc.wait()
 
 # Fungsi-fungsi untuk pengaturan
 def save_settings(cctv_list, settings):
+    # Serialisasi di thread pemanggil (snapshot), penulisan ke disk di latar belakang
     try:
+        # rtsp_url berisi password dan dibangun ulang saat load; jangan ikut disimpan
         config = {
-            'cctv_list': cctv_list,
+            'cctv_list': [{key: value for key, value in cctv.items() if key != 'rtsp_url'}
+                          for cctv in cctv_list],
             'settings': settings
         }
-        with open('nvr_config.json', 'w') as f:
-            json.dump(config, f, indent=4)
-        logger.info("Settings saved successfully")
+        _save_queue.put(json.dumps(config, indent=4))
     except Exception as e:
-        logger.error(f"Error saving settings: {str(e)}")
+        logger.error("Error saving settings: %s", e)
         messagebox.showerror("Error", "Gagal menyimpan pengaturan")
 
+def config_digest(payload):
+    return hashlib.blake2b(payload.encode('utf-8')).digest()
+
+def write_settings(payload):
+    global _last_saved_hash
+    payload_hash = config_digest(payload)
+    if payload_hash == _last_saved_hash:
+        return True
+
+    for attempt in range(SAVE_RETRIES):
+        try:
+            # Tulis ke file sementara lalu ganti secara atomik
+            with open('nvr_config.json.tmp', 'w') as f:
+                f.write(payload)
+            os.replace('nvr_config.json.tmp', 'nvr_config.json')
+            _last_saved_hash = payload_hash
+            logger.info("Settings saved successfully")
+            return True
+        except OSError as e:
+            logger.error("Error saving settings (percobaan %d): %s", attempt + 1, e)
+            if attempt + 1 < SAVE_RETRIES:
+                time.sleep(2 ** attempt)
+    return False
+
+def settings_writer(on_error):
+    # None di antrean menandakan aplikasi ditutup; permintaan yang masih
+    # tertunda tetap ditulis lebih dulu
+    lower_thread_priority()
+    running = True
+    while running:
+        pending = [_save_queue.get()]
+        while True:
+            try:
+                pending.append(_save_queue.get_nowait())
+            except queue.Empty:
+                break
+
+        running = None not in pending
+        payloads = [payload for payload in pending if payload is not None]
+        # Permintaan yang menumpuk digabung: hanya state terbaru yang ditulis
+        if payloads and not write_settings(payloads[-1]):
+            on_error()
+
 def load_settings():
+    global _last_saved_hash
     try:
         with open('nvr_config.json', 'r') as f:
-            config = json.load(f)
-            return config.get('cctv_list', []), config.get('settings', {})
+            payload = f.read()
+            config = json.loads(payload)
+            # Simpan pertama tanpa perubahan tidak perlu menulis ulang file
+            _last_saved_hash = config_digest(payload)
+            cctv_list = config.get('cctv_list', [])
+            for cctv in cctv_list:
+                cctv['rtsp_url'] = build_rtsp_url(cctv)
+            return cctv_list, config.get('settings', {})
     except FileNotFoundError:
         return [], {
             'duration': 3600,
@@ -68,7 +643,7 @@ def load_settings():
             'days_to_keep': 7
         }
     except Exception as e:
-        logger.error(f"Error loading settings: {str(e)}")
+        logger.error("Error loading settings: %s", e)
         return [], {
             'duration': 3600,
             'split_duration': 300,
@@ -76,13 +651,30 @@ def load_settings():
         }
 
 # Fungsi-fungsi untuk manajemen CCTV
+def build_rtsp_url(cctv):
+    return f"rtsp://{cctv['username']}:{urllib.parse.quote(cctv['password'])}@{cctv['ip']}:554/Streaming/Channels/101"
+
+def is_valid_host(host):
+    if _IP_RE.match(host):
+        return all(0 <= int(o) <= 255 for o in host.split('.'))
+    # Nama yang seluruhnya angka tetapi bukan IPv4 (mis. 1.2.3) bukan hostname
+    return bool(_HOSTNAME_RE.match(host)) and not host.replace('.', '').isdigit()
+
 def add_device(cctv_list):
-    ip = simpledialog.askstring("Input", "Masukkan IP CCTV:")
+    ip = simpledialog.askstring("Input", "Masukkan IP atau hostname CCTV:")
+    if ip is None:
+        return False
+    ip = ip.strip()
+    if not is_valid_host(ip):
+        messagebox.showerror("Error", f"IP atau hostname CCTV tidak valid: {ip}")
+        return False
     username = simpledialog.askstring("Input", "Masukkan Username:")
     password = simpledialog.askstring("Input", "Masukkan Password:")
 
     if ip and username and password:
-        cctv_list.append({"ip": ip, "username": username, "password": password})
+        cctv = {"ip": ip, "username": username, "password": password}
+        cctv['rtsp_url'] = build_rtsp_url(cctv)
+        cctv_list.append(cctv)
         messagebox.showinfo("Info", f"CCTV {ip} berhasil ditambahkan.")
         return True
     return False
@@ -92,9 +684,10 @@ def show_cctv_list(cctv_list):
         messagebox.showinfo("Daftar CCTV", "Belum ada CCTV yang ditambahkan")
         return
     
-    cctv_info = "Daftar CCTV:\n\n"
-    for i, cctv in enumerate(cctv_list, 1):
-        cctv_info += f"{i}. IP: {cctv['ip']}\n   Username: {cctv['username']}\n\n"
+    cctv_info = "Daftar CCTV:\n\n" + "".join(
+        f"{i}. IP: {cctv['ip']}\n   Username: {cctv['username']}\n\n"
+        for i, cctv in enumerate(cctv_list, 1)
+    )
     
     messagebox.showinfo("Daftar CCTV", cctv_info)
 
@@ -103,10 +696,9 @@ def remove_cctv(cctv_list):
         messagebox.showwarning("Peringatan", "Tidak ada CCTV untuk dihapus")
         return
 
-    ip_list = [f"{i+1}. {cctv['ip']}" for i, cctv in enumerate(cctv_list)]
-    message = "Masukkan nomor CCTV yang akan dihapus:\n\n"
-    for ip in ip_list:
-        message += ip + "\n"
+    message = "Masukkan nomor CCTV yang akan dihapus:\n\n" + "".join(
+        f"{i}. {cctv['ip']}\n" for i, cctv in enumerate(cctv_list, 1)
+    )
     
     ip_to_remove = simpledialog.askstring("Hapus CCTV", message)
 
@@ -121,68 +713,193 @@ def remove_cctv(cctv_list):
         messagebox.showerror("Error", "Masukkan nomor yang valid")
     return False
 
+# Fungsi untuk preview
+def publish_preview(frame, preview_buf, preview_slot):
+    # INTER_AREA lebih cepat dan lebih halus untuk downscale
+    cv2.resize(frame, PREVIEW_SIZE, dst=preview_buf, interpolation=cv2.INTER_AREA)
+    preview_slot.put(preview_buf)
+
+def encode_ppm(frame):
+    # tk.PhotoImage bisa membaca PPM langsung sehingga tidak perlu PIL
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    height, width = rgb.shape[:2]
+    return f'P6 {width} {height} 255 '.encode() + rgb.tobytes()
+
 # Fungsi untuk merekam video
-def record_video(rtsp_url, record_duration, days_to_keep, stop_event, split_duration=300):
+def run_recorder(log_queue, cpu_index, *args):
+    # Entry point proses perekam
+    setup_logging(log_queue)
+    choose_recorder_cpu(cpu_index)
+    # Objek hasil import (cv2, numpy, tkinter) hidup selama proses; keluarkan
+    # dari pelacakan GC agar koleksi generasi 2 saat merekam tidak memindainya
+    gc.freeze()
+    record_video(*args)
+
+def record_video(rtsp_url, camera_folder, record_duration, stop_event, split_duration,
+                 preview_event, preview_slot):
+    proc = None
+    writer = None
+    producer = None
+    capture_stop = Event()
     try:
-        # Gunakan FFMPEG options untuk meningkatkan stabilitas
-        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'H264'))
-        
-        # Set buffer yang lebih besar
-        os.environ['OPENCV_FFMPEG_CAPTURE_OPTIONS'] = 'rtsp_transport;tcp|buffer_size;2048'
-        
-        if not cap.isOpened():
-            logger.error("Tidak dapat membuka stream RTSP")
-            return
+        # Mode passthrough: capture OpenCV hanya untuk preview dan dibuka oleh
+        # iter_frames saat preview diaktifkan; split diatur ffmpeg sendiri
+        cap = cv2.VideoCapture()
+        close_writer = close_video_writer if TRANSCODE else close_passthrough_writer
+        if TRANSCODE:
+            # Kamera yang mati saat perekaman dimulai dicoba terus, sama seperti
+            # reconnect di iter_frames, sampai terbuka atau perekaman dihentikan
+            while not open_stream(cap, rtsp_url):
+                logger.error("Tidak dapat membuka stream RTSP, mencoba lagi")
+                if stop_event.wait(RECONNECT_DELAY):
+                    return
+
+            # Dibaca dari stream yang sudah terbuka (murah); resolusi kamera bisa
+            # diubah sewaktu-waktu sehingga nilai tersimpan tidak bisa dipercaya
+            frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+
+            detect_video_encoder()
+
+            # Decimasi di capture: encoder hanya bekerja pada frame yang disimpan,
+            # dan file ditulis dengan fps hasil decimasi agar durasinya tetap benar
+            decimate = 1
+            if TRANSCODE_FPS and fps > TRANSCODE_FPS:
+                decimate = round(fps / TRANSCODE_FPS)
+                fps = fps / decimate
+
+            # Preview cukup ~2 FPS dari frame yang direkam
+            preview_every_n = max(1, int(fps // 2))
+
+            # Batas rekaman dan split dihitung dalam jumlah frame, bukan jam dinding
+            record_frames = int(record_duration * fps)
+            split_frames = int(split_duration * fps)
 
-        frame_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        frame_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+            # Capture berjalan di thread sendiri agar socket RTSP tetap terkuras
+            # walaupun penulisan ke disk sedang lambat
+            slot = LatestFrame()
+            producer = Thread(target=capture_frames, args=(cap, rtsp_url, slot, capture_stop, decimate),
+                              daemon=True)
+            producer.start()
+            Thread(target=close_on_stop, args=(stop_event, slot), daemon=True).start()
+            seq = 0
+        preview_buf = np.empty(PREVIEW_SHAPE, dtype=np.uint8)
 
         while not stop_event.is_set():
-            directory = create_directory_for_today()
-            start_time = time.time()
-
-            while time.time() - start_time < record_duration and not stop_event.is_set():
-                video_file = get_video_filename(directory)
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                out = cv2.VideoWriter(video_file, fourcc, fps, (frame_width, frame_height))
-
-                split_start_time = time.time()
-                while time.time() - split_start_time < split_duration and not stop_event.is_set():
-                    ret, frame = cap.read()
-                    if not ret:
+            # Template strftime, dipakai ulang untuk setiap split dalam satu siklus
+            filename_template = os.path.join(create_directory_for_today(camera_folder), VIDEO_FILENAME)
+
+            if not TRANSCODE:
+                # ffmpeg menyalin stream dan memecah file sendiri; tidak ada yang perlu
+                # diparalelkan, jadi preview dibaca langsung di loop ini tanpa thread
+                proc = open_passthrough_writer(rtsp_url, filename_template, split_duration, record_duration)
+                for frame in iter_frames(cap, rtsp_url, stop_event, preview_event=preview_event):
+                    if proc.poll() is not None:
                         break
+                    if frame is not None:
+                        publish_preview(frame, preview_buf, preview_slot)
+
+                close_writer(proc)
+                if proc.returncode and not stop_event.is_set():
+                    logger.error("ffmpeg berhenti dengan kode %s, mencoba lagi", proc.returncode)
+                    stop_event.wait(5)
+                proc = None
+                continue
+
+            if slot.closed:
+                break
 
-                    out.write(frame)
-                    resized_frame = cv2.resize(frame, (680, 460))
-                    cv2.imshow('CCTV Monitor', resized_frame)
+            recorded = 0
+            while recorded < record_frames and not stop_event.is_set() and not slot.closed:
+                video_file = datetime.datetime.now().strftime(filename_template)
+                proc = open_video_writer(video_file, frame_width, frame_height, fps)
+                frame_q = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+                writer = Thread(target=write_frames, args=(proc, frame_q, slot.release), daemon=True)
+                writer.start()
 
-                    if cv2.waitKey(1) & 0xFF == ord('q'):
-                        stop_event.set()
+                split_count = 0
+                write_dropped = 0
+                # Penulis berhenti jika ffmpeg mati; akhiri split daripada terus mengantre
+                while split_count < split_frames and not stop_event.is_set() and writer.is_alive():
+                    # Buffer frame dari pool slot; kembali ke pool setelah ditulis
+                    seq, frame = slot.get(seq)
+                    if frame is None:
+                        if slot.closed:
+                            break
+                        continue
+
+                    # Resolusi berubah (mis. setelah reconnect): frame mentah dengan
+                    # ukuran lain akan merusak file, jadi mulai split baru dengan -s baru
+                    if frame.shape[:2] != (frame_height, frame_width):
+                        logger.info("Resolusi stream berubah dari %dx%d ke %dx%d",
+                                    frame_width, frame_height, frame.shape[1], frame.shape[0])
+                        frame_height, frame_width = frame.shape[:2]
+                        slot.release(frame)
                         break
 
-                out.release()
+                    # Burst singkat ditahan; drop hanya jika penulis macet > 2 frame
+                    write_dropped += enqueue_frame(frame_q, frame, 2 / fps, slot.release)
+                    if split_count % preview_every_n == 0 and preview_event.is_set():
+                        publish_preview(frame, preview_buf, preview_slot)
+                    split_count += 1
+
+                stop_frame_writer(frame_q, writer, slot.release)
+                writer = None
+                close_writer(proc)
+                if proc.returncode:
+                    logger.error("ffmpeg berhenti dengan kode %s pada %s", proc.returncode, video_file)
+                    # Jangan memutar ulang ffmpeg yang langsung gagal tanpa jeda
+                    if not fall_back_to_software_encoder():
+                        stop_event.wait(5)
+                proc = None
+                recorded += split_count
 
-            clean_old_videos('storage/', days_to_keep)
+                read_dropped = slot.take_dropped()
+                if read_dropped or write_dropped:
+                    logger.info("Frame dibuang pada %s: %d saat capture, %d saat menulis",
+                                video_file, read_dropped, write_dropped)
 
     except Exception as e:
-        logger.error(f"Recording error: {str(e)}")
+        logger.error("Recording error: %s", e)
     finally:
+        if writer is not None:
+            stop_frame_writer(frame_q, writer, slot.release)
+        if proc is not None:
+            close_writer(proc)
+        capture_stop.set()
+        if producer is not None:
+            producer.join(timeout=5)
         cap.release()
-        cv2.destroyAllWindows()
 
-def start_recording(cctv_list, duration, days_to_keep, stop_event, split_duration):
-    threads = []
-    for cctv in cctv_list:
-        rtsp_url = f"rtsp://{cctv['username']}:{urllib.parse.quote(cctv['password'])}@{cctv['ip']}:554/Streaming/Channels/101"
-        thread = Thread(target=record_video, 
-                       args=(rtsp_url, duration, days_to_keep, stop_event, split_duration))
-        threads.append(thread)
-        thread.start()
+def start_recording(cctv_list, duration, stop_event, split_duration, preview_event, preview_slots,
+                    log_queue, on_started=None):
+    # Satu proses per kamera agar decode/encode tidak berebut GIL
+    processes = []
+    # Slot kamera yang sudah dihapus tidak lagi ditampilkan di monitor
+    current_ips = {cctv['ip'] for cctv in cctv_list}
+    for ip in list(preview_slots):
+        if ip not in current_ips:
+            del preview_slots[ip]
 
-    for thread in threads:
-        thread.join()
+    for index, cctv in enumerate(cctv_list):
+        # Slot shared memory (~1 MB) dipakai ulang antar start; setdefault akan
+        # tetap mengalokasikan slot baru setiap kali
+        if cctv['ip'] not in preview_slots:
+            preview_slots[cctv['ip']] = SharedPreview()
+        preview_slot = preview_slots[cctv['ip']]
+        process = multiprocessing.Process(target=run_recorder, 
+                                          args=(log_queue, index, cctv['rtsp_url'], camera_folder_name(cctv['ip']),
+                                                duration, stop_event, split_duration,
+                                                preview_event, preview_slot))
+        processes.append(process)
+        process.start()
+
+    if on_started is not None:
+        on_started()
+
+    for process in processes:
+        process.join()
 
 # Fungsi utama untuk GUI
 def main_gui():
@@ -190,8 +907,32 @@ def main_gui():
     root.title("NVR CCTV Manager")
     root.geometry("400x600")
 
+    log_queue, log_listener = start_log_listener()
     cctv_list, settings = load_settings()
-    stop_event = Event()
+    stop_event = multiprocessing.Event()
+    shutdown_event = Event()
+    preview_event = multiprocessing.Event()
+    preview_slots = {}
+    recording_threads = []
+
+    Thread(target=cleanup_loop, args=(shutdown_event, settings), daemon=True).start()
+
+    # Pesan dari thread latar belakang; messagebox hanya boleh dipanggil dari thread GUI
+    gui_messages = queue.Queue()
+
+    def process_gui_messages():
+        while not gui_messages.empty():
+            show, title, message = gui_messages.get_nowait()
+            show(title, message)
+        root.after(500, process_gui_messages)
+
+    settings_thread = Thread(
+        target=settings_writer,
+        args=(lambda: gui_messages.put((messagebox.showerror, "Error", "Gagal menyimpan pengaturan")),),
+        daemon=True
+    )
+    settings_thread.start()
+    process_gui_messages()
 
     main_frame = tk.Frame(root, bg='#f0f0f0')
     main_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
@@ -246,7 +987,9 @@ def main_gui():
             'split_duration': int(split_duration_entry.get()),
             'days_to_keep': int(days_to_keep_entry.get())
         }
-        save_settings(cctv_list, current_settings)
+        # Update in-place agar cleanup_loop membaca nilai terbaru
+        settings.update(current_settings)
+        save_settings(cctv_list, settings)
 
     save_settings_button = tk.Button(settings_frame, text="Simpan Pengaturan", 
                                    command=save_current_settings, **button_style)
@@ -260,16 +1003,35 @@ def main_gui():
             messagebox.showwarning("Peringatan", "Tambahkan CCTV terlebih dahulu!")
             return
 
+        # Sesi sebelumnya harus benar-benar selesai: perekam yang masih menutup
+        # ffmpeg akan melihat stop_event yang di-clear lalu merekam lagi, dan dua
+        # ffmpeg satu kamera saling menimpa file dengan nama yang sama
+        if any(thread.is_alive() for thread in recording_threads):
+            messagebox.showwarning("Peringatan",
+                                   "Perekaman masih berjalan atau sedang dihentikan")
+            return
+        recording_threads.clear()
+
         save_current_settings()
         
         duration = int(duration_entry.get())
-        days_to_keep = int(days_to_keep_entry.get())
         split_duration = int(split_duration_entry.get())
         stop_event.clear()
-        recording_thread = Thread(target=start_recording, 
-                               args=(cctv_list, duration, days_to_keep, stop_event, split_duration))
+        # Proses perekam dijalankan di thread terpisah; hasilnya dilaporkan lewat
+        # gui_messages agar mainloop Tk tidak membeku selama start
+        recording_thread = Thread(target=run_recording, args=(duration, split_duration))
         recording_thread.start()
-        messagebox.showinfo("Info", "Perekaman dimulai")
+        recording_threads.append(recording_thread)
+
+    def run_recording(duration, split_duration):
+        try:
+            start_recording(cctv_list, duration, stop_event, split_duration,
+                            preview_event, preview_slots, log_queue,
+                            on_started=lambda: gui_messages.put(
+                                (messagebox.showinfo, "Info", "Perekaman dimulai")))
+        except Exception as e:
+            logger.error("Error starting recording: %s", e)
+            gui_messages.put((messagebox.showerror, "Error", "Gagal memulai perekaman"))
 
     def stop_recording_action():
         stop_event.set()
@@ -283,6 +1045,82 @@ def main_gui():
                                    command=stop_recording_action, **button_style)
     stop_recording_button.pack(pady=5)
 
+    # Preview semua kamera di satu jendela, di-refresh dari thread GUI
+    show_preview = tk.BooleanVar(value=False)
+    preview_window = None
+    preview_views = {}
+    refresh_job = None
+
+    def refresh_preview():
+        nonlocal refresh_job
+
+        # Buang tampilan kamera yang slot-nya sudah dihapus lalu susun ulang grid
+        stale = [ip for ip in preview_views if ip not in preview_slots]
+        for ip in stale:
+            preview_views.pop(ip)['label'].destroy()
+        if stale:
+            for index, view in enumerate(preview_views.values()):
+                view['label'].grid(row=index // 2, column=index % 2, padx=5, pady=5)
+
+        for ip, slot in list(preview_slots.items()):
+            view = preview_views.get(ip)
+            if view is None:
+                photo = tk.PhotoImage(master=preview_window, width=PREVIEW_SIZE[0],
+                                       height=PREVIEW_SIZE[1])
+                label = tk.Label(preview_window, image=photo, text=ip, compound=tk.TOP)
+                index = len(preview_views)
+                label.grid(row=index // 2, column=index % 2, padx=5, pady=5)
+                view = preview_views[ip] = {'photo': photo, 'label': label, 'seq': 0, 'frame': None}
+
+            seq, frame = slot.get(view['seq'], view['frame'])
+            if frame is None:
+                continue
+            view['seq'], view['frame'] = seq, frame
+            view['photo'].configure(data=encode_ppm(frame), format='PPM')
+
+        refresh_job = root.after(100, refresh_preview)
+
+    def toggle_preview():
+        nonlocal preview_window, refresh_job
+        if show_preview.get():
+            preview_event.set()
+            preview_window = tk.Toplevel(root)
+            preview_window.title("CCTV Monitor")
+            preview_window.protocol("WM_DELETE_WINDOW", close_preview)
+            preview_views.clear()
+            refresh_preview()
+        else:
+            preview_event.clear()
+            if refresh_job is not None:
+                root.after_cancel(refresh_job)
+                refresh_job = None
+            if preview_window is not None:
+                preview_window.destroy()
+                preview_window = None
+
+    def close_preview():
+        show_preview.set(False)
+        toggle_preview()
+
+    preview_check = tk.Checkbutton(control_frame, text="Tampilkan Preview", variable=show_preview,
+                                   command=toggle_preview, bg='#f0f0f0')
+    preview_check.pack(pady=5)
+
     root.mainloop()
+    try:
+        # Jendela ditutup: hentikan semua proses perekam lebih dulu, jika tidak
+        # mereka terus merekam tanpa GUI dan thread perekaman menahan interpreter
+        stop_event.set()
+        for recording_thread in recording_threads:
+            recording_thread.join()
+        shutdown_event.set()
+        _save_queue.put(None)
+        settings_thread.join()
+    finally:
+        # Listener dihentikan paling akhir, setelah semua proses perekam selesai,
+        # agar record terakhir mereka (mis. error ffmpeg saat ditutup) masih
+        # dibaca dari antrean dan ditulis ke file log
+        log_listener.stop()
 if __name__ == "__main__":
+    multiprocessing.set_start_method('spawn')
     main_gui()
\ No newline at end of file